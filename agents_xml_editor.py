@@ -1,10 +1,72 @@
+import operator
+import os
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox
+from collections import Counter
+from dataclasses import dataclass, field
 from pathlib import Path
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import XMLGenerator
 
 XML_FILE = Path("my_agents.xml")
 
+# Sottoproprietà di <Instructions>: (tag XML, attributo di Agent)
+INSTRUCTION_FIELDS = (
+    ("Role", "role"),
+    ("LanguageTone", "language_tone"),
+    ("ToolsUsage", "tools_usage"),
+    ("MainFlows", "main_flows"),
+    ("ErrorHandling", "error_handling"),
+    ("ExtraNotes", "extra_notes"),
+)
+
+# Estrae in un colpo solo i valori di INSTRUCTION_FIELDS da un Agent
+get_instruction_values = operator.attrgetter(*(attr for _tag, attr in INSTRUCTION_FIELDS))
+
+# Ritardo (ms) prima di popolare il form dopo un cambio di selezione:
+# scorrendo la griglia con le frecce si carica solo l'agente finale
+FORM_LOAD_DELAY_MS = 50
+
+# Procedura Tcl che inserisce un blocco di righe nella Treeview con una sola
+# chiamata Python -> Tcl. Argomenti: widget, lista piatta {pos iid values ...}.
+# Viene definita una volta (e quindi compilata in bytecode una volta sola).
+TCL_INSERT_ROWS_PROC = "agents_editor_insert_rows"
+TCL_INSERT_ROWS_BODY = (
+    "foreach {pos iid values} $rows "
+    "{$tree insert {} $pos -id $iid -values $values}"
+)
+
+
+@dataclass(slots=True)
+class Agent:
+    """Agente in memoria, come letto da / scritto su my_agents.xml."""
+
+    id: str = ""
+    name: str = ""
+    description: str = ""
+    role: str = ""
+    language_tone: str = ""
+    tools_usage: str = ""
+    main_flows: str = ""
+    error_handling: str = ""
+    extra_notes: str = ""
+    # Descrizione troncata per la griglia (derivata, non salvata)
+    display_desc: str = field(default="", repr=False, compare=False)
+
+    def __post_init__(self):
+        self.set_description(self.description)
+
+    def set_description(self, text: str):
+        """Imposta la descrizione e, una volta sola, la sua versione per la griglia."""
+        self.description = text
+        # Sostituire "\n" non cambia la lunghezza: si tocca solo il prefisso
+        # mostrato, non l'intera descrizione (che può essere lunga)
+        if len(text) > 100:
+            self.display_desc = text[:97].replace("\n", " ") + "..."
+        else:
+            self.display_desc = text.replace("\n", " ")
+
 
 class AgentsXmlEditor(tk.Tk):
     def __init__(self):
@@ -13,21 +75,32 @@ class AgentsXmlEditor(tk.Tk):
         self.title("Editor my_agents.xml")
         self.geometry("1000x600")
 
-        # Lista agent in memoria: ogni elemento è un dict con chiavi:
-        # id, name, description, role, language_tone, tools_usage,
-        # main_flows, error_handling, extra_notes
-        self.agents = []
+        # Lista agent in memoria (istanze di Agent)
+        self.agents: list[Agent] = []
         self.current_index = None  # indice dell'agente selezionato
         self.dirty = False         # True se ci sono modifiche non salvate
 
+        # Griglia virtualizzata: nella Treeview sono materializzate solo le
+        # righe della finestra visibile [_first_row, _first_row + _visible_rows)
+        self._first_row = 0
+        self._visible_rows = 15
+        self._rendered = range(0)
+
+        # Caricamento differito del form (vedi _schedule_form_load)
+        self._pending_select_idx = None
+        self._select_after_id = None
+        # Quanti agenti usano ciascun ID: costruito al caricamento e poi
+        # aggiornato a ogni modifica/eliminazione (controllo ID duplicati in O(1))
+        self._id_counts: Counter[str] = Counter()
+
         self._create_widgets()
         self._load_agents()
         self._refresh_tree()
 
-        # Se esiste almeno un agente, seleziona il primo
+        # Se esiste almeno un agente, seleziona il primo (la riga viene
+        # selezionata nella griglia dal refresh)
         if self.agents:
-            self.tree.selection_set("0")
-            self.tree.focus("0")
+            self.current_index = 0
             self._load_agent_to_form(0)
 
         self.protocol("WM_DELETE_WINDOW", self._on_close)
@@ -48,6 +121,12 @@ class AgentsXmlEditor(tk.Tk):
         for b in (btn_varia, btn_salva, btn_abbandona, btn_inserisci, btn_elimina):
             b.pack(side=tk.LEFT, padx=5)
 
+        # Barra di stato in basso (impacchettata prima del corpo per non
+        # essere schiacciata quando la finestra si rimpicciolisce)
+        self.status_lbl = ttk.Label(self, text="", anchor="w", padding=(5, 2))
+        self.status_lbl.pack(side=tk.BOTTOM, fill=tk.X)
+        self._status_after_id = None
+
         # Corpo: sinistra (griglia), destra (dettaglio) con PanedWindow per dare
         # più spazio alla parte destra (peso maggiore).
         body = ttk.Panedwindow(self, orient=tk.HORIZONTAL)
@@ -77,16 +156,25 @@ class AgentsXmlEditor(tk.Tk):
         self.tree.column("description", width=280, anchor="w")
 
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.tk.call("proc", TCL_INSERT_ROWS_PROC, "tree rows", TCL_INSERT_ROWS_BODY)
 
-        scrollbar = ttk.Scrollbar(left_frame, orient="vertical", command=self.tree.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        # La scrollbar scorre la finestra sulla lista agent, non la Treeview
+        self.scrollbar = ttk.Scrollbar(left_frame, orient="vertical", command=self._on_tree_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
         # Binding: selezione, Invio per "edit", doppio click
         self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
         self.tree.bind("<Return>", self._on_tree_edit_request)
         self.tree.bind("<Double-1>", self._on_tree_edit_request)
 
+        # Binding per la finestra visibile: ridimensionamento, rotella, tastiera
+        self.tree.bind("<Configure>", self._on_tree_configure)
+        self.tree.bind("<MouseWheel>", self._on_tree_wheel)
+        self.tree.bind("<Button-4>", self._on_tree_wheel)
+        self.tree.bind("<Button-5>", self._on_tree_wheel)
+        for key in ("<Up>", "<Down>", "<Prior>", "<Next>", "<Home>", "<End>"):
+            self.tree.bind(key, self._on_tree_key)
+
         # Destra: dettaglio agente (più larga, weight più alto)
         right_frame = ttk.Frame(body, padding=5, relief="groove")
         body.add(right_frame, weight=3)
@@ -95,49 +183,31 @@ class AgentsXmlEditor(tk.Tk):
             row=0, column=0, columnspan=3, sticky="w", pady=(0, 5)
         )
 
-        ttk.Label(right_frame, text="ID:").grid(row=1, column=0, sticky="e", padx=5, pady=2)
-        self.var_id = tk.StringVar()
-        self.entry_id = ttk.Entry(right_frame, textvariable=self.var_id)
-        self.entry_id.grid(row=1, column=1, sticky="ew", padx=5, pady=2)
-
-        ttk.Label(right_frame, text="Nome:").grid(row=2, column=0, sticky="e", padx=5, pady=2)
-        self.var_name = tk.StringVar()
-        self.entry_name = ttk.Entry(right_frame, textvariable=self.var_name)
-        self.entry_name.grid(row=2, column=1, sticky="ew", padx=5, pady=2)
-
-        ttk.Label(right_frame, text="Descrizione:").grid(row=3, column=0, sticky="ne", padx=5, pady=2)
-        self.txt_description = tk.Text(right_frame, height=3, wrap="word")
-        self.txt_description.grid(row=3, column=1, columnspan=2, sticky="ew", padx=5, pady=2)
+        add_row = self._add_form_row
+        self.entry_id = add_row(right_frame, 1, "ID:", ttk.Entry(right_frame), columnspan=1)
+        self.entry_name = add_row(right_frame, 2, "Nome:", ttk.Entry(right_frame), columnspan=1)
+        self.entry_description = add_row(right_frame, 3, "Descrizione:", ttk.Entry(right_frame))
 
         # --- Sottoproprietà Instructions ---
 
-        ttk.Label(right_frame, text="Ruolo / scopo:").grid(row=4, column=0, sticky="ne", padx=5, pady=2)
-        self.txt_role = tk.Text(right_frame, height=3, wrap="word")
-        self.txt_role.grid(row=4, column=1, columnspan=2, sticky="ew", padx=5, pady=2)
-
-        ttk.Label(right_frame, text="Linguaggio e tono:").grid(row=5, column=0, sticky="ne", padx=5, pady=2)
-        self.txt_language_tone = tk.Text(right_frame, height=3, wrap="word")
-        self.txt_language_tone.grid(row=5, column=1, columnspan=2, sticky="ew", padx=5, pady=2)
-
-        ttk.Label(right_frame, text="Uso tool / MCP / REST:").grid(row=6, column=0, sticky="ne", padx=5, pady=2)
-        self.txt_tools_usage = tk.Text(right_frame, height=4, wrap="word")
-        self.txt_tools_usage.grid(row=6, column=1, columnspan=2, sticky="ew", padx=5, pady=2)
-
-        ttk.Label(right_frame, text="Flussi operativi principali:").grid(row=7, column=0, sticky="ne", padx=5, pady=2)
-        self.txt_main_flows = tk.Text(right_frame, height=8, wrap="word")
-        self.txt_main_flows.grid(row=7, column=1, sticky="nsew", padx=5, pady=2)
+        self.entry_role = add_row(right_frame, 4, "Ruolo / scopo:", ttk.Entry(right_frame))
+        self.entry_language_tone = add_row(right_frame, 5, "Linguaggio e tono:", ttk.Entry(right_frame))
+        self.txt_tools_usage = add_row(
+            right_frame, 6, "Uso tool / MCP / REST:", tk.Text(right_frame, height=4, wrap="word")
+        )
+        self.txt_main_flows = add_row(
+            right_frame, 7, "Flussi operativi principali:", tk.Text(right_frame, height=8, wrap="word"),
+            columnspan=1, sticky="nsew",
+        )
 
         main_flows_scroll = ttk.Scrollbar(right_frame, orient="vertical", command=self.txt_main_flows.yview)
         main_flows_scroll.grid(row=7, column=2, sticky="ns")
         self.txt_main_flows.configure(yscrollcommand=main_flows_scroll.set)
 
-        ttk.Label(right_frame, text="Gestione errori / note extra:").grid(row=8, column=0, sticky="ne", padx=5, pady=2)
-        self.txt_error_handling = tk.Text(right_frame, height=4, wrap="word")
-        self.txt_error_handling.grid(row=8, column=1, columnspan=2, sticky="ew", padx=5, pady=2)
-
-        ttk.Label(right_frame, text="Note aggiuntive (facoltative):").grid(row=9, column=0, sticky="ne", padx=5, pady=2)
-        self.txt_extra_notes = tk.Text(right_frame, height=3, wrap="word")
-        self.txt_extra_notes.grid(row=9, column=1, columnspan=2, sticky="ew", padx=5, pady=2)
+        self.txt_error_handling = add_row(
+            right_frame, 8, "Gestione errori / note extra:", tk.Text(right_frame, height=4, wrap="word")
+        )
+        self.entry_extra_notes = add_row(right_frame, 9, "Note aggiuntive (facoltative):", ttk.Entry(right_frame))
 
         # Layout weight per allargare bene
         right_frame.columnconfigure(1, weight=1)
@@ -146,6 +216,15 @@ class AgentsXmlEditor(tk.Tk):
         # Salvo il riferimento al frame destro se servisse in futuro
         self.right_frame = right_frame
 
+    @staticmethod
+    def _add_form_row(parent, row: int, label: str, widget, columnspan: int = 2, sticky: str = "ew"):
+        """Aggiunge al form una riga etichetta + widget e restituisce il widget."""
+        # Le etichette dei campi multiriga restano allineate in alto
+        label_sticky = "ne" if isinstance(widget, tk.Text) else "e"
+        ttk.Label(parent, text=label).grid(row=row, column=0, sticky=label_sticky, padx=5, pady=2)
+        widget.grid(row=row, column=1, columnspan=columnspan, sticky=sticky, padx=5, pady=2)
+        return widget
+
     # ===================== CARICAMENTO / SALVATAGGIO XML =====================
 
     def _load_agents(self):
@@ -156,140 +235,328 @@ class AgentsXmlEditor(tk.Tk):
             self.dirty = False
             return
 
+        agents = []
         try:
-            tree = ET.parse(XML_FILE)
-            root = tree.getroot()
+            # Parsing incrementale: ogni <Agent> viene convertito in Agent appena
+            # chiuso e poi rimosso dall'albero, così la memoria resta limitata
+            # al singolo agente invece che all'intero documento.
+            # Il primo evento "start" è la radice: serve solo per svuotarla.
+            events = ET.iterparse(str(XML_FILE), events=("start", "end"))
+            _event, root = next(events)
+            for event, elem in events:
+                if event != "end" or elem.tag != "Agent":
+                    continue
+
+                agents.append(self._agent_from_element(elem))
+                elem.clear()
+                root.clear()
         except Exception as e:
             messagebox.showerror("Errore XML", f"Impossibile leggere {XML_FILE}:\n{e}")
             self.agents = []
             self.dirty = False
             return
 
-        agents = []
-        for agent_el in root.findall("Agent"):
-            agent_id = (agent_el.get("id") or "").strip()
-            name = (agent_el.get("name") or "").strip()
-
-            desc_el = agent_el.find("Description")
-            description = (desc_el.text or "") if desc_el is not None else ""
-
-            instr_el = agent_el.find("Instructions")
-
-            role = ""
-            language_tone = ""
-            tools_usage = ""
-            main_flows = ""
-            error_handling = ""
-            extra_notes = ""
-
-            if instr_el is not None:
-                children = list(instr_el)
-                if children:
-                    def _get(tag: str) -> str:
-                        return instr_el.findtext(tag, default="") or ""
-
-                    role = _get("Role")
-                    language_tone = _get("LanguageTone")
-                    tools_usage = _get("ToolsUsage")
-                    main_flows = _get("MainFlows")
-                    error_handling = _get("ErrorHandling")
-                    extra_notes = _get("ExtraNotes")
-                else:
-                    # compatibilità con vecchio XML: testo unico
-                    main_flows = instr_el.text or ""
-
-            agents.append(
-                {
-                    "id": agent_id,
-                    "name": name,
-                    "description": description,
-                    "role": role,
-                    "language_tone": language_tone,
-                    "tools_usage": tools_usage,
-                    "main_flows": main_flows,
-                    "error_handling": error_handling,
-                    "extra_notes": extra_notes,
-                }
-            )
-
         self.agents = agents
         self.dirty = False
 
+    @staticmethod
+    def _agent_from_element(agent_el) -> Agent:
+        """Converte un elemento <Agent> nell'Agent usato dall'editor."""
+        agent_id = agent_el.get("id", "").strip()
+        name = agent_el.get("name", "").strip()
+
+        # Una sola scansione dei figli invece di un find/findtext per campo
+        # (setdefault: vale il primo elemento con quel tag, come con find)
+        children = {}
+        for child in agent_el:
+            children.setdefault(child.tag, child)
+
+        desc_el = children.get("Description")
+        description = (desc_el.text or "").strip() if desc_el is not None else ""
+
+        instr_el = children.get("Instructions")
+
+        instructions = {}
+        if instr_el is not None:
+            if len(instr_el):
+                # Il salvataggio scrive i campi già "strip()": farlo anche qui
+                # evita gli a-capo dell'XML indentato nei campi a riga singola
+                texts = {}
+                for child in instr_el:
+                    texts.setdefault(child.tag, (child.text or "").strip())
+                for tag, attr in INSTRUCTION_FIELDS:
+                    instructions[attr] = texts.get(tag, "")
+            else:
+                # compatibilità con vecchio XML: testo unico
+                instructions["main_flows"] = (instr_el.text or "").strip()
+
+        return Agent(id=agent_id, name=name, description=description, **instructions)
+
     def _save_agents(self):
         """Scrive gli agent nel file my_agents.xml."""
-        root = ET.Element("Agents")
-
-        for agent in self.agents:
-            agent_id = agent.get("id", "").strip()
-            name = agent.get("name", "").strip()
-            description = agent.get("description", "")
-
-            role = agent.get("role", "")
-            language_tone = agent.get("language_tone", "")
-            tools_usage = agent.get("tools_usage", "")
-            main_flows = agent.get("main_flows", "")
-            error_handling = agent.get("error_handling", "")
-            extra_notes = agent.get("extra_notes", "")
-
-            agent_el = ET.SubElement(root, "Agent")
-            if agent_id:
-                agent_el.set("id", agent_id)
-            if name:
-                agent_el.set("name", name)
-
-            desc_el = ET.SubElement(agent_el, "Description")
-            desc_el.text = description
-
-            instr_el = ET.SubElement(agent_el, "Instructions")
-
-            def _add_if_not_empty(tag: str, value: str):
-                value = (value or "").strip()
-                if value:
-                    el = ET.SubElement(instr_el, tag)
-                    el.text = value
-
-            _add_if_not_empty("Role", role)
-            _add_if_not_empty("LanguageTone", language_tone)
-            _add_if_not_empty("ToolsUsage", tools_usage)
-            _add_if_not_empty("MainFlows", main_flows)
-            _add_if_not_empty("ErrorHandling", error_handling)
-            _add_if_not_empty("ExtraNotes", extra_notes)
-
-        tree = ET.ElementTree(root)
+        if not self.dirty:
+            # Nessuna modifica rispetto al file: niente da riscrivere
+            return True
+
+        # L'XML viene scritto in streaming (niente albero di Element in
+        # memoria) su un file temporaneo che poi sostituisce atomicamente
+        # l'originale: un crash a metà scrittura non lascia mai my_agents.xml
+        # troncato.
+        tmp_file = XML_FILE.with_suffix(".xml.tmp")
         try:
-            tree.write(XML_FILE, encoding="utf-8", xml_declaration=True)
+            # Stream di testo: la codifica UTF-8 avviene a blocchi nel buffer
+            # del file invece che a ogni chiamata del generatore (uno stream
+            # binario verrebbe avvolto in un TextIOWrapper write-through)
+            with open(tmp_file, "w", encoding="utf-8", newline="\n") as out:
+                self._write_agents_xml(out)
+            os.replace(tmp_file, XML_FILE)
         except Exception as e:
+            # Non lasciare accanto alla configurazione un file a metà
+            try:
+                tmp_file.unlink(missing_ok=True)
+            except OSError:
+                pass
             messagebox.showerror("Errore salvataggio", f"Impossibile scrivere {XML_FILE}:\n{e}")
             return False
 
         self.dirty = False
-        messagebox.showinfo("Salvataggio", f"File salvato correttamente:\n{XML_FILE}")
+        # Conferma non modale: un messagebox bloccherebbe l'event loop a ogni salvataggio
+        self._show_status(f"Salvato {XML_FILE} alle {time.strftime('%H:%M:%S')}")
         return True
 
+    def _show_status(self, text: str, timeout_ms: int = 3000):
+        """Mostra un messaggio nella barra di stato e lo cancella dopo timeout_ms."""
+        if self._status_after_id is not None:
+            self.after_cancel(self._status_after_id)
+        self.status_lbl.configure(text=text)
+        self._status_after_id = self.after(timeout_ms, self._clear_status)
+
+    def _clear_status(self):
+        self._status_after_id = None
+        self.status_lbl.configure(text="")
+
+    def _write_agents_xml(self, out):
+        """Serializza gli agent su uno stream di testo, indentando come ET.indent."""
+        gen = XMLGenerator(out, "utf-8", short_empty_elements=True)
+        gen.startDocument()
+        gen.startElement("Agents", {})
+
+        for agent in self.agents:
+            attrs = {}
+            agent_id = agent.id.strip()
+            name = agent.name.strip()
+            if agent_id:
+                attrs["id"] = agent_id
+            if name:
+                attrs["name"] = name
+
+            # Solo le sottoproprietà non vuote
+            instructions = [
+                (tag, value.strip())
+                for (tag, _attr), value in zip(INSTRUCTION_FIELDS, get_instruction_values(agent))
+                if value and not value.isspace()
+            ]
+
+            gen.ignorableWhitespace("\n  ")
+            gen.startElement("Agent", attrs)
+
+            # Description e Instructions vuote non vengono scritte: entrambi i
+            # loader (editor e my_agents.py) le trattano come assenti
+            if agent.description:
+                gen.ignorableWhitespace("\n    ")
+                gen.startElement("Description", {})
+                gen.characters(agent.description)
+                gen.endElement("Description")
+
+            if instructions:
+                gen.ignorableWhitespace("\n    ")
+                gen.startElement("Instructions", {})
+                for tag, value in instructions:
+                    gen.ignorableWhitespace("\n      ")
+                    gen.startElement(tag, {})
+                    gen.characters(value)
+                    gen.endElement(tag)
+                gen.ignorableWhitespace("\n    ")
+                gen.endElement("Instructions")
+
+            if agent.description or instructions:
+                gen.ignorableWhitespace("\n  ")
+            gen.endElement("Agent")
+
+        if self.agents:
+            gen.ignorableWhitespace("\n")
+        gen.endElement("Agents")
+        gen.ignorableWhitespace("\n")
+        gen.endDocument()
+
     # ===================== GESTIONE TREEVIEW =====================
 
+    def _rebuild_index(self):
+        """Ricalcola da zero il conteggio degli ID (solo al caricamento)."""
+        self._id_counts = Counter(agent.id for agent in self.agents if agent.id)
+
+    def _change_id_count(self, agent_id: str, delta: int):
+        """Aggiorna il conteggio di un ID dopo una modifica o un'eliminazione."""
+        if not agent_id:
+            return
+        self._id_counts[agent_id] += delta
+        if self._id_counts[agent_id] <= 0:
+            del self._id_counts[agent_id]
+
     def _refresh_tree(self):
-        """Aggiorna la griglia degli agent a partire da self.agents."""
+        """
+        Ricostruisce la griglia (e il conteggio degli ID) a partire da
+        self.agents. Serve solo al caricamento: inserimenti ed eliminazioni
+        passano da _invalidate_rows_from.
+        """
+        self._rebuild_index()
         self.tree.delete(*self.tree.get_children())
+        self._rendered = range(0)
+        self._render_window()
+        self.after_idle(self._update_visible_rows)
+
+    @staticmethod
+    def _row_values(agent: Agent) -> tuple:
+        """Valori (id, nome, descrizione troncata) di una riga della griglia."""
+        return agent.id, agent.name, agent.display_desc
+
+    def _update_row(self, index: int):
+        """Aggiorna in place la riga di un agente, se materializzata."""
+        if index in self._rendered:
+            self.tree.item(str(index), values=self._row_values(self.agents[index]))
 
-        for idx, agent in enumerate(self.agents):
-            agent_id = agent.get("id", "")
-            name = agent.get("name", "")
-            desc = (agent.get("description", "") or "").replace("\n", " ")
-            if len(desc) > 100:
-                desc = desc[:97] + "..."
-            self.tree.insert("", "end", iid=str(idx), values=(agent_id, name, desc))
+    def _invalidate_rows_from(self, index: int):
+        """
+        Dopo un inserimento/eliminazione in posizione index solo le righe da
+        index in poi cambiano agente (gli iid sono indici in self.agents):
+        rimuove quelle e lascia che _render_window inserisca le mancanti.
+        """
+        stale = [str(idx) for idx in self._rendered if idx >= index]
+        if stale:
+            self.tree.delete(*stale)
+            start = self._rendered.start
+            self._rendered = range(start, max(start, index))
+        self._render_window()
+
+    def _render_window(self):
+        """Materializza nella Treeview solo le righe della finestra visibile."""
+        total = len(self.agents)
+        first = max(0, min(self._first_row, total - self._visible_rows))
+        needed = range(first, min(total, first + self._visible_rows))
+        self._first_row = first
+
+        # Rimuove le righe uscite dalla finestra...
+        stale = [str(idx) for idx in self._rendered if idx not in needed]
+        if stale:
+            self.tree.delete(*stale)
+
+        # ...e inserisce quelle entrate, nella posizione corretta, con un unico
+        # comando Tcl per tutto il blocco invece di un tree.insert per riga
+        rows = []
+        for pos, idx in enumerate(needed):
+            if idx not in self._rendered:
+                rows.extend((pos, str(idx), self._row_values(self.agents[idx])))
+        if rows:
+            self.tk.call(TCL_INSERT_ROWS_PROC, str(self.tree), rows)
+        self._rendered = needed
+
+        # Riallinea la selezione se l'agente corrente è nella finestra
+        if self.current_index in needed:
+            iid = str(self.current_index)
+            if self.tree.selection() != (iid,):
+                self.tree.selection_set(iid)
+            self.tree.focus(iid)
+
+        if total:
+            self.scrollbar.set(first / total, needed.stop / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _ensure_visible(self, index: int):
+        """Sposta la finestra visibile in modo che contenga la riga indicata."""
+        if index < self._first_row:
+            self._first_row = index
+        elif index >= self._first_row + self._visible_rows:
+            self._first_row = index - self._visible_rows + 1
+
+    def _select_row(self, index: int):
+        """Seleziona un agente anche se la sua riga non è materializzata."""
+        self.current_index = index
+        self._ensure_visible(index)
+        self._render_window()
+        self._schedule_form_load(index)
+
+    def _update_visible_rows(self):
+        """Ricalcola quante righe entrano nella Treeview con la dimensione attuale."""
+        children = self.tree.get_children()
+        if not children:
+            return
+        bbox = self.tree.bbox(children[0])
+        if not bbox:
+            return
+        _x, y, _w, row_height = bbox
+        rows = max(1, (self.tree.winfo_height() - y) // row_height)
+        if rows != self._visible_rows:
+            self._visible_rows = rows
+            self._render_window()
+
+    def _on_tree_configure(self, event=None):
+        """Ridimensionamento della griglia: aggiorna la finestra visibile."""
+        self.after_idle(self._update_visible_rows)
+
+    def _on_tree_scroll(self, *args):
+        """Comando della scrollbar ("moveto" / "scroll") sulla lista completa."""
+        if args[0] == "moveto":
+            first = int(float(args[1]) * len(self.agents))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self._visible_rows
+            first = self._first_row + step
+        else:
+            return
+        self._first_row = first
+        self._render_window()
+
+    def _on_tree_wheel(self, event):
+        """Rotella del mouse: scorre la finestra di tre righe."""
+        step = -3 if (event.num == 4 or event.delta > 0) else 3
+        self._first_row += step
+        self._render_window()
+        return "break"
+
+    def _on_tree_key(self, event):
+        """Navigazione da tastiera sull'intera lista, non solo sulle righe visibili."""
+        if not self.agents:
+            return "break"
+
+        current = self.current_index if self.current_index is not None else 0
+        if event.keysym == "Home":
+            index = 0
+        elif event.keysym == "End":
+            index = len(self.agents) - 1
+        else:
+            step = {"Up": -1, "Down": 1, "Prior": -self._visible_rows, "Next": self._visible_rows}
+            index = current + step[event.keysym]
+        index = max(0, min(index, len(self.agents) - 1))
+
+        if index != self.current_index:
+            self._select_row(index)
+        return "break"
 
     def _on_tree_select(self, event=None):
         """Quando seleziono una riga della griglia."""
         sel = self.tree.selection()
         if not sel:
-            self.current_index = None
+            # La riga selezionata è solo uscita dalla finestra visibile
             return
 
         idx = int(sel[0])
+        if idx == self.current_index:
+            # Riselezione dopo uno scroll: non ricaricare (e perdere) il form
+            return
         self.current_index = idx
-        self._load_agent_to_form(idx)
+        self._schedule_form_load(idx)
 
     def _on_tree_edit_request(self, event=None):
         """
@@ -299,21 +566,61 @@ class AgentsXmlEditor(tk.Tk):
         """
         if self.current_index is None:
             return
+        self._flush_form_load()
         self.entry_id.focus_set()
 
     # ===================== FORM DETTAGLIO =====================
 
+    @staticmethod
+    def _set_text(widget: tk.Text, text: str):
+        """Sostituisce il contenuto di un tk.Text con un solo comando Tcl."""
+        widget.replace("1.0", tk.END, text)
+        # Il flag "modified" segnala poi le sole modifiche dell'utente
+        widget.edit_modified(False)
+
+    @staticmethod
+    def _get_text(widget: tk.Text, current: str) -> str:
+        """Legge un tk.Text solo se modificato dopo l'ultimo caricamento."""
+        if widget.tk.getboolean(widget.edit_modified()):
+            return widget.get("1.0", "end-1c")
+        return current
+
+    @staticmethod
+    def _set_entry(entry: ttk.Entry, text: str):
+        """Sostituisce il contenuto di una Entry (senza StringVar e relative trace)."""
+        entry.delete(0, tk.END)
+        entry.insert(0, text)
+
+    def _schedule_form_load(self, index: int):
+        """Programma il caricamento nel form, annullando quello ancora in attesa."""
+        if self._select_after_id is not None:
+            self.after_cancel(self._select_after_id)
+        self._pending_select_idx = index
+        self._select_after_id = self.after(FORM_LOAD_DELAY_MS, self._maybe_load_form)
+
+    def _maybe_load_form(self):
+        """Carica il form solo se la selezione non è cambiata nel frattempo."""
+        self._select_after_id = None
+        if self._pending_select_idx == self.current_index:
+            self._load_agent_to_form(self._pending_select_idx)
+
+    def _flush_form_load(self):
+        """Esegue subito il caricamento in attesa, prima di leggere/modificare il form."""
+        if self._select_after_id is not None:
+            self.after_cancel(self._select_after_id)
+            self._maybe_load_form()
+
     def _clear_form(self):
-        self.var_id.set("")
-        self.var_name.set("")
-        self.txt_description.delete("1.0", tk.END)
+        self._set_entry(self.entry_id, "")
+        self._set_entry(self.entry_name, "")
+        self._set_entry(self.entry_description, "")
 
-        self.txt_role.delete("1.0", tk.END)
-        self.txt_language_tone.delete("1.0", tk.END)
-        self.txt_tools_usage.delete("1.0", tk.END)
-        self.txt_main_flows.delete("1.0", tk.END)
-        self.txt_error_handling.delete("1.0", tk.END)
-        self.txt_extra_notes.delete("1.0", tk.END)
+        self._set_entry(self.entry_role, "")
+        self._set_entry(self.entry_language_tone, "")
+        self._set_text(self.txt_tools_usage, "")
+        self._set_text(self.txt_main_flows, "")
+        self._set_text(self.txt_error_handling, "")
+        self._set_entry(self.entry_extra_notes, "")
 
     def _load_agent_to_form(self, index: int):
         """Carica i dati dell'agente indicato nell'area di dettaglio."""
@@ -322,29 +629,17 @@ class AgentsXmlEditor(tk.Tk):
             return
 
         agent = self.agents[index]
-        self.var_id.set(agent.get("id", ""))
-        self.var_name.set(agent.get("name", ""))
-
-        self.txt_description.delete("1.0", tk.END)
-        self.txt_description.insert("1.0", agent.get("description", "") or "")
-
-        self.txt_role.delete("1.0", tk.END)
-        self.txt_role.insert("1.0", agent.get("role", "") or "")
-
-        self.txt_language_tone.delete("1.0", tk.END)
-        self.txt_language_tone.insert("1.0", agent.get("language_tone", "") or "")
-
-        self.txt_tools_usage.delete("1.0", tk.END)
-        self.txt_tools_usage.insert("1.0", agent.get("tools_usage", "") or "")
-
-        self.txt_main_flows.delete("1.0", tk.END)
-        self.txt_main_flows.insert("1.0", agent.get("main_flows", "") or "")
+        self._set_entry(self.entry_id, agent.id)
+        self._set_entry(self.entry_name, agent.name)
 
-        self.txt_error_handling.delete("1.0", tk.END)
-        self.txt_error_handling.insert("1.0", agent.get("error_handling", "") or "")
+        self._set_entry(self.entry_description, agent.description)
 
-        self.txt_extra_notes.delete("1.0", tk.END)
-        self.txt_extra_notes.insert("1.0", agent.get("extra_notes", "") or "")
+        self._set_entry(self.entry_role, agent.role)
+        self._set_entry(self.entry_language_tone, agent.language_tone)
+        self._set_text(self.txt_tools_usage, agent.tools_usage)
+        self._set_text(self.txt_main_flows, agent.main_flows)
+        self._set_text(self.txt_error_handling, agent.error_handling)
+        self._set_entry(self.entry_extra_notes, agent.extra_notes)
 
     def _apply_form_to_current_agent(self):
         """Scrive i dati del form nell'agente selezionato."""
@@ -355,23 +650,39 @@ class AgentsXmlEditor(tk.Tk):
         if self.current_index < 0 or self.current_index >= len(self.agents):
             return False
 
-        agent = self.agents[self.current_index]
-        agent["id"] = self.var_id.get().strip()
-        agent["name"] = self.var_name.get().strip()
-        agent["description"] = self.txt_description.get("1.0", tk.END).rstrip("\n")
-
-        agent["role"] = self.txt_role.get("1.0", tk.END).rstrip("\n")
-        agent["language_tone"] = self.txt_language_tone.get("1.0", tk.END).rstrip("\n")
-        agent["tools_usage"] = self.txt_tools_usage.get("1.0", tk.END).rstrip("\n")
-        agent["main_flows"] = self.txt_main_flows.get("1.0", tk.END).rstrip("\n")
-        agent["error_handling"] = self.txt_error_handling.get("1.0", tk.END).rstrip("\n")
-        agent["extra_notes"] = self.txt_extra_notes.get("1.0", tk.END).rstrip("\n")
+        # Il form deve mostrare l'agente selezionato prima di essere letto
+        self._flush_form_load()
+
+        current = self.agents[self.current_index]
+        # I tk.Text non toccati dall'utente non vengono riletti
+        edited = Agent(
+            id=self.entry_id.get().strip(),
+            name=self.entry_name.get().strip(),
+            description=self.entry_description.get(),
+            role=self.entry_role.get(),
+            language_tone=self.entry_language_tone.get(),
+            tools_usage=self._get_text(self.txt_tools_usage, current.tools_usage),
+            main_flows=self._get_text(self.txt_main_flows, current.main_flows),
+            error_handling=self._get_text(self.txt_error_handling, current.error_handling),
+            extra_notes=self.entry_extra_notes.get(),
+        )
+        if edited == current:
+            # Form identico all'agente: nessuna modifica da registrare
+            return True
+
+        # Controllo solo se l'ID cambia: un file che ha già ID doppi deve
+        # restare modificabile
+        if edited.id and edited.id != current.id and self._id_counts[edited.id]:
+            messagebox.showwarning("ID duplicato", f"Esiste già un agente con ID '{edited.id}'.")
+            return False
 
+        self.agents[self.current_index] = edited
         self.dirty = True
-        self._refresh_tree()
-        # Reseleziona la riga
-        self.tree.selection_set(str(self.current_index))
-        self.tree.focus(str(self.current_index))
+        if edited.id != current.id:
+            self._change_id_count(current.id, -1)
+            self._change_id_count(edited.id, +1)
+        # Cambia solo il contenuto di una riga: niente ricostruzione della griglia
+        self._update_row(self.current_index)
         return True
 
     # ===================== AZIONI RIBBON =====================
@@ -383,8 +694,8 @@ class AgentsXmlEditor(tk.Tk):
     def _on_salva(self):
         """Pulsante 'Salva': scrive my_agents.xml."""
         # Prima sincronizza eventuali modifiche nel form sull'agente selezionato
-        if self.current_index is not None:
-            self._apply_form_to_current_agent()
+        if self.current_index is not None and not self._apply_form_to_current_agent():
+            return
         self._save_agents()
 
     def _on_abbandona(self):
@@ -393,25 +704,13 @@ class AgentsXmlEditor(tk.Tk):
 
     def _on_inserisci(self):
         """Pulsante 'Inserisci Agente': crea un nuovo agente vuoto."""
-        new_agent = {
-            "id": "",
-            "name": "",
-            "description": "",
-            "role": "",
-            "language_tone": "",
-            "tools_usage": "",
-            "main_flows": "",
-            "error_handling": "",
-            "extra_notes": "",
-        }
-        self.agents.append(new_agent)
+        self.agents.append(Agent())
         self.dirty = True
-        self._refresh_tree()
 
         new_index = len(self.agents) - 1
         self.current_index = new_index
-        self.tree.selection_set(str(new_index))
-        self.tree.focus(str(new_index))
+        self._ensure_visible(new_index)
+        self._invalidate_rows_from(new_index)
         self._load_agent_to_form(new_index)
 
     def _on_elimina(self):
@@ -424,16 +723,18 @@ class AgentsXmlEditor(tk.Tk):
             return
 
         agent = self.agents[self.current_index]
-        name = agent.get("name") or agent.get("id") or "(senza nome)"
+        name = agent.name or agent.id or "(senza nome)"
 
         if not messagebox.askyesno("Conferma eliminazione", f"Vuoi eliminare l'agente:\n{name}?"):
             return
 
-        del self.agents[self.current_index]
+        deleted_index = self.current_index
+        del self.agents[deleted_index]
+        self._change_id_count(agent.id, -1)
         self.dirty = True
         self.current_index = None
         self._clear_form()
-        self._refresh_tree()
+        self._invalidate_rows_from(deleted_index)
 
     # ===================== CHIUSURA =====================
 
@@ -1,7 +1,6 @@
 # db_models.py
 
-from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from sqlalchemy import (
     Column,
@@ -11,8 +10,12 @@ from sqlalchemy import (
     Date,
     DateTime,
     ForeignKey,
+    Index,
     UniqueConstraint,
     create_engine,
+    event,
+    func,
+    insert,
 )
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker, Session
 
@@ -27,6 +30,30 @@ engine = create_engine(
     connect_args={"check_same_thread": False},  # necessario per SQLite + FastAPI
 )
 
+# PRAGMA applicati a ogni nuova connessione SQLite:
+# - WAL: le letture non bloccano la scrittura (e viceversa)
+# - synchronous=NORMAL: in WAL niente fsync a ogni commit, il DB resta consistente
+# - tabelle temporanee in RAM, file mappato in memoria (256 MB), cache da 64 MB
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
+if engine.dialect.name == "sqlite":
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in SQLITE_PRAGMAS:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 Base = declarative_base()
@@ -81,6 +108,8 @@ class Price(Base):
     __tablename__ = "prices"
     __table_args__ = (
         UniqueConstraint("customer_id", "article_id", name="uq_price_customer_article"),
+        # ricerca prezzi per articolo, indipendentemente dal cliente
+        Index("ix_prices_article", "article_id"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -115,7 +144,9 @@ class OrderHeader(Base):
     order_date = Column(Date, nullable=False)
     delivery_date = Column(Date, nullable=False)
     status = Column(String(20), nullable=False, default="INSERTED")
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # CURRENT_TIMESTAMP (UTC) scritto direttamente nella INSERT dal DB, senza
+    # calcolarlo in Python: funziona anche sulle tabelle già create
+    created_at = Column(DateTime, nullable=False, default=func.now())
 
     customer = relationship("Customer", back_populates="orders")
     lines = relationship("OrderLine", back_populates="order", cascade="all, delete-orphan")
@@ -123,6 +154,10 @@ class OrderHeader(Base):
 
 class OrderLine(Base):
     __tablename__ = "order_lines"
+    __table_args__ = (
+        # righe di un ordine, nell'ordine di visualizzazione
+        Index("ix_order_lines_order_line", "order_id", "line_no"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
@@ -136,6 +171,19 @@ class OrderLine(Base):
     article = relationship("Article", back_populates="order_lines")
 
 
+# ===================== INSERIMENTI IN BLOCCO =====================
+
+def bulk_add_order_lines(session: Session, order_id: int, rows: List[dict]) -> None:
+    """
+    Inserisce le righe di un ordine con un'unica INSERT (executemany),
+    senza creare un oggetto OrderLine per ogni riga.
+
+    :param rows: dizionari con line_no, article_id, quantity, unit_price, discount.
+    """
+    if rows:
+        session.execute(insert(OrderLine), [{"order_id": order_id, **row} for row in rows])
+
+
 # ===================== INIT DB =====================
 
 def init_db() -> None:
@@ -144,3 +192,9 @@ def init_db() -> None:
     Da chiamare una volta all'avvio dell'app FastAPI.
     """
     Base.metadata.create_all(bind=engine)
+
+    # create_all non tocca le tabelle già esistenti: gli indici aggiunti
+    # dopo la prima creazione vanno creati a parte (se mancano)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
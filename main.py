@@ -1,10 +1,12 @@
 import os
 import sys
 import asyncio
+import contextlib
 import logging
 import subprocess
 from typing import Dict
 
+import uvicorn
 from dotenv import load_dotenv
 
 from agents import Agent
@@ -22,12 +24,31 @@ logging.basicConfig(
 logger = logging.getLogger("main")
 
 
+class EmbeddedRestServer(uvicorn.Server):
+    """uvicorn.Server da eseguire come task dentro l'event loop del bot.
+
+    - non installa gestori di SIGINT/SIGTERM: i segnali restano al task
+      principale, che ferma prima il bot e poi la REST API (should_exit)
+    - un errore di avvio (es. porta occupata) diventa un RuntimeError invece
+      del sys.exit(1) di uvicorn
+    """
+
+    def capture_signals(self):
+        return contextlib.nullcontext()
+
+    async def serve(self, sockets=None) -> None:
+        try:
+            await super().serve(sockets)
+        except SystemExit as exc:
+            raise RuntimeError("Avvio della REST API non riuscito (vedi log di uvicorn)") from exc
+
+
 async def main() -> None:
     """Punto di ingresso principale dell'applicazione.
 
     Sequenza:
     1) Carica variabili d'ambiente
-    2) Avvia la REST API locale (uvicorn rest_api:app)
+    2) Avvia la REST API locale (uvicorn rest_api:app, nello stesso processo)
     3) Avvia il MCP server (mcp_server.py)
     4) Carica dinamicamente gli agent dal file my_agents.xlm/xml
     5) Avvia il bot Telegram che usa gli agent
@@ -36,34 +57,46 @@ async def main() -> None:
 
     # ================== AVVIO REST API (uvicorn) ==================
     rest_proc: subprocess.Popen | None = None
+    rest_server: EmbeddedRestServer | None = None
+    rest_task: asyncio.Task | None = None
     try:
         # Se vuoi personalizzare il comando, puoi usare la variabile d'ambiente
-        # ORDERS_REST_COMMAND, altrimenti uso python -m uvicorn rest_api:app ...
+        # ORDERS_REST_COMMAND: la REST API parte allora come processo separato.
         rest_cmd_env = os.getenv("ORDERS_REST_COMMAND")
         if rest_cmd_env:
             # esempio: ORDERS_REST_COMMAND="python -m uvicorn rest_api:app --host 127.0.0.1 --port 8001 --reload"
             rest_cmd = rest_cmd_env.split()
+
+            logger.info("Avvio REST API con comando: %s", " ".join(rest_cmd))
+            rest_proc = subprocess.Popen(
+                rest_cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+            logger.info("REST API avviata con PID=%s", rest_proc.pid)
         else:
-            # Comando di default per avviare la REST API
-            rest_cmd = [
-                sys.executable,
-                "-m",
-                "uvicorn",
-                "rest_api:app",
-                "--host",
-                "127.0.0.1",
-                "--port",
-                "8001",
-                "--reload",  # se non ti serve il reload, puoi toglierlo
-            ]
-
-        logger.info("Avvio REST API con comando: %s", " ".join(rest_cmd))
-        rest_proc = subprocess.Popen(
-            rest_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        logger.info("REST API avviata con PID=%s", rest_proc.pid)
+            # Default: uvicorn gira nello stesso processo e sullo stesso event
+            # loop del bot (niente secondo interprete da avviare)
+            from rest_api import app as rest_app
+
+            rest_server = EmbeddedRestServer(
+                uvicorn.Config(
+                    rest_app,
+                    host="127.0.0.1",
+                    port=8001,
+                    log_level="warning",
+                    loop="asyncio",
+                )
+            )
+            rest_task = asyncio.create_task(rest_server.serve())
+
+            # Attende che uvicorn sia in ascolto: se si ferma prima, esce subito
+            while not rest_server.started and not rest_task.done():
+                await asyncio.sleep(0.05)
+            if rest_task.done():
+                rest_task.result()
+                raise RuntimeError("La REST API si è fermata durante l'avvio")
+            logger.info("REST API avviata nel processo corrente su http://127.0.0.1:8001")
 
         # ================== AVVIO MCP SERVER ==================
 
@@ -114,10 +147,16 @@ async def main() -> None:
             except Exception:
                 logger.exception("Il bot si è fermato a causa di un errore")
             finally:
+                await bot.aclose()
                 logger.info("Chiusura OrdersBot completata.")
 
     finally:
         # ================== ARRESTO REST API ==================
+        if rest_task is not None and not rest_task.done():
+            logger.info("Arresto REST API...")
+            rest_server.should_exit = True
+            await rest_task
+
         if rest_proc is not None:
             if rest_proc.poll() is None:
                 logger.info("Invio terminate() alla REST API (PID=%s)...", rest_proc.pid)
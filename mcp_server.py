@@ -73,6 +73,58 @@ class RestConfig:
 
 # ===================== PARSING XML =====================
 
+def _service_from_element(svc_el: ET.Element) -> Optional[ServiceConfig]:
+    """
+    Converte un elemento <Service> in ServiceConfig.
+
+    :return: None se il service non ha name/path (viene ignorato).
+    """
+    name = svc_el.attrib.get("name")
+    method = (svc_el.attrib.get("method") or "GET").upper()
+    path_attr = svc_el.attrib.get("path", "")
+
+    if not name or not path_attr:
+        logger.warning("Service senza name/path nel file XML, ignorato: %s", svc_el.attrib)
+        return None
+
+    params_cfg: List[ParamConfig] = []
+    for param_el in svc_el.findall("Param"):
+        p_name = param_el.attrib.get("name")
+        if not p_name:
+            logger.warning("Param senza name nel service '%s', ignorato", name)
+            continue
+
+        required = (param_el.attrib.get("required", "false").lower() == "true")
+        location = (param_el.attrib.get("location") or "query").lower()
+        if location not in {"path", "query", "body"}:
+            logger.warning(
+                "location '%s' non valida per param '%s' in service '%s', "
+                "uso 'query' di default",
+                location,
+                p_name,
+                name,
+            )
+            location = "query"
+
+        p_type = param_el.attrib.get("type", "string")
+
+        params_cfg.append(
+            ParamConfig(
+                name=p_name,
+                required=required,
+                location=location,
+                type=p_type,
+            )
+        )
+
+    return ServiceConfig(
+        name=name,
+        method=method,
+        path=path_attr,
+        params=params_cfg,
+    )
+
+
 def load_rest_config_from_xml(path: str) -> RestConfig:
     """
     Carica la configurazione REST da un file XML.
@@ -86,9 +138,12 @@ def load_rest_config_from_xml(path: str) -> RestConfig:
     if not os.path.isfile(path):
         raise ValueError(f"File XML non trovato: {path}")
 
+    # Parsing incrementale: la radice arriva col primo evento "start" (con
+    # già gli attributi), ogni <Service> viene convertito appena chiuso e poi
+    # rimosso dall'albero.
     try:
-        tree = ET.parse(path)
-        root = tree.getroot()
+        events = ET.iterparse(path, events=("start", "end"))
+        _event, root = next(events)
     except Exception as exc:
         raise ValueError(f"Errore nel parsing XML '{path}': {exc}") from exc
 
@@ -101,54 +156,31 @@ def load_rest_config_from_xml(path: str) -> RestConfig:
 
     services: Dict[str, ServiceConfig] = {}
 
-    for svc_el in root.findall("Service"):
-        name = svc_el.attrib.get("name")
-        method = (svc_el.attrib.get("method") or "GET").upper()
-        path_attr = svc_el.attrib.get("path", "")
-
-        if not name or not path_attr:
-            logger.warning("Service senza name/path nel file XML, ignorato: %s", svc_el.attrib)
-            continue
+    # Profondità dell'elemento corrente (radice = 1): contano solo i <Service>
+    # figli diretti di <RestServices>, come nel parsing con root.findall
+    depth = 1
+    try:
+        for event, svc_el in events:
+            if event == "start":
+                depth += 1
+                continue
 
-        params_cfg: List[ParamConfig] = []
-        for param_el in svc_el.findall("Param"):
-            p_name = param_el.attrib.get("name")
-            if not p_name:
-                logger.warning("Param senza name nel service '%s', ignorato", name)
+            depth -= 1
+            if depth != 1:
                 continue
 
-            required = (param_el.attrib.get("required", "false").lower() == "true")
-            location = (param_el.attrib.get("location") or "query").lower()
-            if location not in {"path", "query", "body"}:
-                logger.warning(
-                    "location '%s' non valida per param '%s' in service '%s', "
-                    "uso 'query' di default",
-                    location,
-                    p_name,
-                    name,
-                )
-                location = "query"
-
-            p_type = param_el.attrib.get("type", "string")
-
-            params_cfg.append(
-                ParamConfig(
-                    name=p_name,
-                    required=required,
-                    location=location,
-                    type=p_type,
-                )
-            )
+            svc = _service_from_element(svc_el) if svc_el.tag == "Service" else None
+            svc_el.clear()
+            root.clear()
+            if svc is None:
+                continue
 
-        if name in services:
-            logger.warning("Service duplicato '%s' nel file XML, sovrascrivo il precedente", name)
+            if svc.name in services:
+                logger.warning("Service duplicato '%s' nel file XML, sovrascrivo il precedente", svc.name)
 
-        services[name] = ServiceConfig(
-            name=name,
-            method=method,
-            path=path_attr,
-            params=params_cfg,
-        )
+            services[svc.name] = svc
+    except ET.ParseError as exc:
+        raise ValueError(f"Errore nel parsing XML '{path}': {exc}") from exc
 
     if not services:
         logger.warning("Nessun service definito nel file XML '%s'", path)
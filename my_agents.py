@@ -33,6 +33,20 @@ class AgentsConfigError(Exception):
 _AGENTS_BY_ID: Optional[Dict[str, Dict[str, str]]] = None
 
 
+def _iter_agent_elements(path: Path):
+    """
+    Scorre gli <Agent> del file in streaming (iterparse): ogni elemento viene
+    liberato dopo l'elaborazione, così non resta in memoria l'intero albero.
+    """
+    events = ET.iterparse(str(path), events=("start", "end"))
+    _event, root = next(events)
+    for event, elem in events:
+        if event == "end" and elem.tag == "Agent":
+            yield elem
+            elem.clear()
+            root.clear()
+
+
 def _load_agents_from_xml() -> Dict[str, Dict[str, str]]:
     """
     Legge la configurazione degli agent da my_agents.xml
@@ -50,12 +64,9 @@ def _load_agents_from_xml() -> Dict[str, Dict[str, str]]:
             f"Ho cercato: {primary.resolve()}"
         )
 
-    tree = ET.parse(path)
-    root = tree.getroot()
-
     agents_by_id: Dict[str, Dict[str, str]] = {}
 
-    for agent_el in root.findall("Agent"):
+    for agent_el in _iter_agent_elements(path):
         agent_id = (agent_el.get("id") or "").strip()
         name = (agent_el.get("name") or "").strip()
 
@@ -66,11 +77,17 @@ def _load_agents_from_xml() -> Dict[str, Dict[str, str]]:
             )
             continue
 
-        desc_el = agent_el.find("Description")
+        # Una sola scansione dei figli invece di un find per ogni tag
+        # (setdefault: vale il primo elemento con quel tag, come con find)
+        children: Dict[str, ET.Element] = {}
+        for child in agent_el:
+            children.setdefault(child.tag, child)
+
+        desc_el = children.get("Description")
         description = (desc_el.text or "").strip() if desc_el is not None else ""
 
         # ====== nuova struttura Instructions con sottoproprietà ======
-        instr_el = agent_el.find("Instructions")
+        instr_el = children.get("Instructions")
 
         role = ""
         language_tone = ""
@@ -81,18 +98,18 @@ def _load_agents_from_xml() -> Dict[str, Dict[str, str]]:
         instructions = ""
 
         if instr_el is not None:
-            children = list(instr_el)
-
-            if children:
-                def _get(tag: str) -> str:
-                    return (instr_el.findtext(tag, default="") or "").strip()
-
-                role = _get("Role")
-                language_tone = _get("LanguageTone")
-                tools_usage = _get("ToolsUsage")
-                main_flows = _get("MainFlows")
-                error_handling = _get("ErrorHandling")
-                extra_notes = _get("ExtraNotes")
+            if len(instr_el):
+                # Testi delle sottoproprietà raccolti in un unico passaggio
+                fields: Dict[str, str] = {}
+                for child in instr_el:
+                    fields.setdefault(child.tag, (child.text or "").strip())
+
+                role = fields.get("Role", "")
+                language_tone = fields.get("LanguageTone", "")
+                tools_usage = fields.get("ToolsUsage", "")
+                main_flows = fields.get("MainFlows", "")
+                error_handling = fields.get("ErrorHandling", "")
+                extra_notes = fields.get("ExtraNotes", "")
 
                 parts = [
                     role,
@@ -40,6 +40,11 @@ def reset_database() -> None:
     else:
         print(f"[*] Nessun database esistente da rimuovere ({db_path})")
 
+    # Con journal_mode=WAL possono restare i file -wal/-shm del vecchio DB
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
     print("[*] Creo nuovo schema (tabelle)...")
     init_db()
     print("[+] Schema creato.\n")
@@ -12,7 +12,7 @@
 # Avvio:
 #   uvicorn rest_api:app --host 127.0.0.1 --port 8001 --reload
 
-from datetime import date, datetime
+from datetime import date
 from typing import List, Optional
 import logging
 
@@ -26,9 +26,9 @@ from db_models import (
     Customer,
     Article,
     OrderHeader,
-    OrderLine,
     Price,
     StockLevel,
+    bulk_add_order_lines,
 )
 
 # ===================== LOGGING =====================
@@ -650,15 +650,19 @@ def create_order(payload: OrderCreate, db: Session = Depends(get_db)):
         order_date=date.today(),
         delivery_date=delivery_date,
         status="INSERTED",
-        created_at=datetime.utcnow(),
     )
     db.add(order_header)
     db.flush()  # per avere order_header.id
 
+    # Articoli di tutte le righe con una sola query
+    codes = {line_in.article_code for line_in in payload.lines}
+    articles = {art.code: art for art in db.query(Article).filter(Article.code.in_(codes))}
+
+    line_rows: List[dict] = []
     lines_out: List[OrderLineOut] = []
 
     for idx, line_in in enumerate(payload.lines, start=1):
-        art = db.query(Article).filter(Article.code == line_in.article_code).first()
+        art = articles.get(line_in.article_code)
         if not art:
             raise HTTPException(
                 status_code=400,
@@ -669,15 +673,15 @@ def create_order(payload: OrderCreate, db: Session = Depends(get_db)):
         unit_price = None
         discount = None
 
-        line = OrderLine(
-            order_id=order_header.id,
-            line_no=idx,
-            article_id=art.id,
-            quantity=line_in.quantity,
-            unit_price=unit_price,
-            discount=discount,
+        line_rows.append(
+            {
+                "line_no": idx,
+                "article_id": art.id,
+                "quantity": line_in.quantity,
+                "unit_price": unit_price,
+                "discount": discount,
+            }
         )
-        db.add(line)
 
         lines_out.append(
             OrderLineOut(
@@ -689,6 +693,7 @@ def create_order(payload: OrderCreate, db: Session = Depends(get_db)):
             )
         )
 
+    bulk_add_order_lines(db, order_header.id, line_rows)
     db.commit()
 
     return OrderOut(
@@ -1,6 +1,8 @@
 import os
 import logging
 import asyncio
+import sqlite3
+import threading
 from typing import Dict
 
 from dotenv import load_dotenv
@@ -15,12 +17,83 @@ from telegram.ext import (
     filters,
 )
 
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 from agents import Agent, Runner, SQLiteSession
 
+from db_models import SQLITE_PRAGMAS
+
 logger = logging.getLogger(__name__)
 
+# Telegram mostra "sta scrivendo..." per circa 5 secondi: lo si rinnova prima
+TYPING_REFRESH_SECONDS = 4.0
+
+# PRAGMA applicati a ogni connessione verso database/sessions.db: gli stessi
+# del DB ordini (SQLITE_PRAGMAS in db_models.py) più wal_autocheckpoint, così
+# i checkpoint del WAL vengono raggruppati ogni 1000 pagine. Solo journal_mode
+# resta salvato nel file, le altre valgono per la connessione: per questo si
+# ripetono a ogni apertura.
+SESSIONS_DB_PRAGMAS = SQLITE_PRAGMAS + ("PRAGMA wal_autocheckpoint=1000",)
+
+
+class SharedSQLiteSession(SQLiteSession):
+    """SQLiteSession che condivide le connessioni tra tutte le chat.
+
+    La SQLiteSession di base apre una connessione per ogni coppia
+    (sessione, thread di lavoro): con molte chat si moltiplicano le
+    connessioni e ognuna parte con la page cache vuota. Qui ogni thread
+    tiene una sola connessione per file DB, aperta al primo uso con le
+    SESSIONS_DB_PRAGMAS e riusata da tutte le sessioni: la cache resta
+    calda tra una richiesta e l'altra.
+
+    Attenzione: ridefinisce _get_connection() e usa _is_memory_db, dettagli
+    interni di agents.memory.SQLiteSession verificati con openai-agents==0.5.1
+    (versione fissata in requirements.txt): da ricontrollare a ogni aggiornamento.
+    """
+
+    _thread_conns = threading.local()
+    # Mappe {db_path: connessione} di tutti i thread, per poterle chiudere e
+    # svuotare da close_all()
+    _thread_maps: list[Dict[str, sqlite3.Connection]] = []
+    _thread_maps_lock = threading.Lock()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._is_memory_db:
+            return super()._get_connection()
+
+        conns: Dict[str, sqlite3.Connection] = getattr(self._thread_conns, "by_path", None)
+        if conns is None:
+            conns = self._thread_conns.by_path = {}
+            with self._thread_maps_lock:
+                self._thread_maps.append(conns)
+
+        db_path = str(self.db_path)
+        conn = conns.get(db_path)
+        if conn is None:
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            for pragma in SESSIONS_DB_PRAGMAS:
+                conn.execute(pragma)
+            conns[db_path] = conn
+        return conn
+
+    def close(self) -> None:
+        # Le connessioni sono condivise: si chiudono tutte insieme con close_all()
+        if self._is_memory_db:
+            super().close()
+
+    @classmethod
+    def close_all(cls) -> None:
+        """Chiude tutte le connessioni aperte dai thread di lavoro.
+
+        Le mappe dei thread vengono svuotate: un uso successivo riapre una
+        connessione nuova invece di trovarne una chiusa.
+        """
+        with cls._thread_maps_lock:
+            for conns in cls._thread_maps:
+                for conn in conns.values():
+                    conn.close()
+                conns.clear()
+
 
 class OrdersBot:
     """Bot Telegram che delega la logica a uno o più Agent OpenAI.
@@ -52,52 +125,55 @@ class OrdersBot:
                 f"default_agent_id='{default_agent_id}' non presente in agents: {list(agents.keys())}"
             )
 
+        # Messaggi fino a questo numero di parole (es. "sì", "ok, procedi")
+        # non passano dal router LLM: riusano l'agent corrente della chat o,
+        # se la chat non ne ha ancora uno, quello di default
+        self.short_message_words: int = int(os.getenv("ORDERS_ROUTER_SHORT_WORDS", "3"))
+
         # Dizionario {agent_id: Agent}
         self.agents: Dict[str, Agent] = agents
         self.default_agent_id: str = default_agent_id
 
-        # Client OpenAI per il routing LLM
-        # Usa OPENAI_API_KEY dalle variabili d'ambiente
-        self.router_client = OpenAI()
+        # Client OpenAI asincrono per il routing LLM: le chiamate girano
+        # sull'event loop del bot (niente thread) e riusano le connessioni
+        # HTTP del suo pool. Usa OPENAI_API_KEY dalle variabili d'ambiente
+        self.router_client = AsyncOpenAI()
 
         # Sessioni per memorizzare la conversazione (una per chat Telegram)
-        self.sessions: Dict[int, SQLiteSession] = {}
+        self.sessions: Dict[int, SharedSQLiteSession] = {}
 
         # agent_id "corrente" per ogni chat (ordini, clienti, ecc.)
         self.current_agent_id: Dict[int, str] = {}
 
+        # Istruzioni del router (catalogo agent + regole): fisse per tutta la
+        # vita del bot, così il prefisso inviato al modello è sempre identico
+        # e il messaggio dell'utente viaggia a parte
+        self._router_instructions: str = self._build_router_instructions()
+
+        # Coppie (agent_id, agent_id in minuscolo) per confrontare la risposta
+        # del router senza rifare lower() a ogni messaggio
+        self._available_ids_lower: list[tuple[str, str]] = [
+            (agent_id, agent_id.lower()) for agent_id in self.agents
+        ]
+
         # Application di python-telegram-bot
         self.application: Application | None = None
 
     # ---------- utility sessione per chat ----------
 
-    def _get_session(self, chat_id: int) -> SQLiteSession:
+    def _get_session(self, chat_id: int) -> SharedSQLiteSession:
         if chat_id not in self.sessions:
             # usa un DB locale 'database/sessions.db'
             sessions_path = os.path.join("database", "sessions.db")
-            self.sessions[chat_id] = SQLiteSession(str(chat_id), sessions_path)
+            self.sessions[chat_id] = SharedSQLiteSession(str(chat_id), sessions_path)
         return self.sessions[chat_id]
 
     # ---------- router LLM per scegliere l'agent ----------
 
-    async def _llm_choose_agent(self, user_text: str) -> str:
-        """
-        Usa l'LLM per decidere quale agent_id usare tra quelli disponibili.
-
-        Restituisce uno degli id presenti in self.agents oppure,
-        in caso di errore, self.default_agent_id.
-        """
+    def _build_router_instructions(self) -> str:
+        """Costruisce le istruzioni del router con una descrizione compatta degli agent noti."""
         available_ids = list(self.agents.keys())
 
-        # Se c'è un solo agent, è inutile chiamare l'LLM
-        if len(available_ids) == 1:
-            logger.info(
-                "Router LLM: un solo agent disponibile (%s), lo uso senza chiamare il modello.",
-                available_ids[0],
-            )
-            return available_ids[0]
-
-        # Costruisco una descrizione compatta degli agent noti
         lines = [
             "Sei un router per un gestionale ordini.",
             "",
@@ -124,22 +200,34 @@ class OrdersBot:
         lines.append("- Rispondi SOLO con uno dei seguenti id di agent, senza altre parole:")
         lines.append("  " + ", ".join(available_ids))
         lines.append("- Non spiegare la scelta, non aggiungere testo.")
-        lines.append("")
-        lines.append("Messaggio dell'utente:")
-        lines.append(user_text)
+        lines.append("- Il messaggio dell'utente è l'input da classificare.")
 
-        prompt = "\n".join(lines)
+        return "\n".join(lines)
 
-        def _call_openai() -> str:
-            response = self.router_client.responses.create(
-                model="gpt-4.1-mini",   # modello leggero per routing
-                input=prompt,
-                max_output_tokens=20,
+    async def _llm_choose_agent(self, user_text: str) -> str:
+        """
+        Usa l'LLM per decidere quale agent_id usare tra quelli disponibili.
+
+        Restituisce uno degli id presenti in self.agents oppure,
+        in caso di errore, self.default_agent_id.
+        """
+        # Se c'è un solo agent, è inutile chiamare l'LLM
+        if len(self._available_ids_lower) == 1:
+            only_id = self._available_ids_lower[0][0]
+            logger.info(
+                "Router LLM: un solo agent disponibile (%s), lo uso senza chiamare il modello.",
+                only_id,
             )
-            return (response.output_text or "").strip()
+            return only_id
 
         try:
-            raw_answer = await asyncio.to_thread(_call_openai)
+            response = await self.router_client.responses.create(
+                model="gpt-4.1-mini",   # modello leggero per routing
+                instructions=self._router_instructions,
+                input=user_text,
+                max_output_tokens=20,
+            )
+            raw_answer = (response.output_text or "").strip()
             answer = raw_answer.strip().lower()
             logger.info("Router LLM - risposta grezza: %r", raw_answer)
         except Exception:
@@ -147,14 +235,14 @@ class OrdersBot:
             return self.default_agent_id
 
         # Cerco un match esatto con uno degli id disponibili
-        for agent_id in available_ids:
-            if answer == agent_id.lower():
+        for agent_id, agent_id_lower in self._available_ids_lower:
+            if answer == agent_id_lower:
                 logger.info("Router LLM - match esatto: %s", agent_id)
                 return agent_id
 
         # Se la risposta contiene uno degli id come parola, lo uso
-        for agent_id in available_ids:
-            if agent_id.lower() in answer:
+        for agent_id, agent_id_lower in self._available_ids_lower:
+            if agent_id_lower in answer:
                 logger.info("Router LLM - match parziale: %s in %r", agent_id, answer)
                 return agent_id
 
@@ -169,17 +257,18 @@ class OrdersBot:
     async def _select_agent(self, chat_id: int, text: str) -> Agent:
         """
         Sceglie quale agent usare:
-        - per brevi risposte di conferma riusa l'agent corrente
+        - per messaggi brevi riusa l'agent corrente (o quello di default)
         - altrimenti chiede al router LLM quale agent_id usare
         """
         t = text.lower().strip()
 
-        # Se ho già un agent in corso e il messaggio è brevissimo (es. "sì", "ok"),
-        # mantengo il contesto senza chiamare il router
-        if chat_id in self.current_agent_id and len(t.split()) <= 3:
-            agent_id = self.current_agent_id[chat_id]
+        # Messaggio brevissimo (es. "sì", "ok", "ciao"): niente router LLM.
+        # Se la chat ha già un agent in corso mantengo il contesto, altrimenti
+        # (primo messaggio della chat) parto dall'agent di default
+        if len(t.split()) <= self.short_message_words:
+            agent_id = self.current_agent_id.setdefault(chat_id, self.default_agent_id)
             logger.info(
-                "Router: riuso agent_id='%s' per chat_id=%s (messaggio breve: %r)",
+                "Router: uso agent_id='%s' per chat_id=%s senza router (messaggio breve: %r)",
                 agent_id,
                 chat_id,
                 text,
@@ -279,21 +368,25 @@ class OrdersBot:
 
         logger.info("Messaggio da %s: %s", chat_id, user_message)
 
-        # Mostra "sta scrivendo..."
+        # Mostra "sta scrivendo..." e lo tiene attivo finché l'agent lavora
         await update.message.chat.send_action(ChatAction.TYPING)
+        typing_task = asyncio.create_task(self._keep_typing(update.message.chat))
 
         try:
-            session = self._get_session(chat_id)
+            try:
+                session = self._get_session(chat_id)
 
-            # Scegli l'agent in base al testo usando il router LLM
-            agent = await self._select_agent(chat_id, user_message)
+                # Scegli l'agent in base al testo usando il router LLM
+                agent = await self._select_agent(chat_id, user_message)
 
-            # Chiama l'Agent (che a sua volta userà MCP quando serve)
-            result = await Runner.run(
-                agent,
-                input=user_message,
-                session=session,
-            )
+                # Chiama l'Agent (che a sua volta userà MCP quando serve)
+                result = await Runner.run(
+                    agent,
+                    input=user_message,
+                    session=session,
+                )
+            finally:
+                typing_task.cancel()
 
             reply_text = result.final_output or "Non ho ottenuto alcuna risposta dall'agent."
             await update.message.reply_text(reply_text, parse_mode="Markdown")
@@ -304,7 +397,21 @@ class OrdersBot:
                 "❌ Mi spiace, ho avuto un errore interno mentre processavo la tua richiesta."
             )
 
-    # ---------- avvio bot ----------
+    async def _keep_typing(self, chat) -> None:
+        """Rinnova l'azione "sta scrivendo..." finché non viene cancellato."""
+        while True:
+            await asyncio.sleep(TYPING_REFRESH_SECONDS)
+            try:
+                await chat.send_action(ChatAction.TYPING)
+            except Exception:
+                logger.debug("Impossibile rinnovare l'azione di typing", exc_info=True)
+
+    # ---------- avvio / chiusura bot ----------
+
+    async def aclose(self) -> None:
+        """Chiude il client OpenAI del router e le connessioni al DB delle sessioni."""
+        await self.router_client.close()
+        SharedSQLiteSession.close_all()
 
     async def run(self) -> None:
         """Avvia il bot Telegram dentro un event loop già esistente (niente run_polling)."""